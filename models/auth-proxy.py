@@ -4,24 +4,62 @@ Authentication Proxy for MLX Services
 Validates API keys before forwarding requests to backend MLX servers.
 """
 
+import re
 import sys
 import argparse
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
 import uvicorn
 from fastapi import FastAPI, Request, HTTPException, status
-from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from starlette.background import BackgroundTask
+from cachetools import TTLCache
 import httpx
-import tomlkit
+import orjson
+import tomllib
+
+
+# Complete <think>...</think> blocks, and a trailing <think> left open when the response cuts off
+_THINK_RE = re.compile(r'<think>.*?</think>\s*', re.DOTALL)
+_UNCLOSED_THINK_RE = re.compile(r'<think>.*', re.DOTALL)
+
+# Hop-by-hop headers describe a single connection and must not be forwarded (RFC 7230 §6.1)
+_HOP_BY_HOP = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+})
+# Header names are matched as raw bytes on both sides, so nothing is decoded per request
+_SKIP_REQUEST_HEADERS = frozenset(h.encode("latin-1") for h in _HOP_BY_HOP | {"host"})
+_SKIP_RESPONSE_HEADERS = frozenset(h.encode("latin-1") for h in _HOP_BY_HOP | {"content-length"})
+# A re-serialized body is plain JSON: it has its own Content-Type and no backend Content-Encoding
+_SKIP_REWRITTEN_HEADERS = _SKIP_RESPONSE_HEADERS | {b"content-type", b"content-encoding"}
+
+
+def _filter_response_headers(headers: httpx.Headers, skip: frozenset = _SKIP_RESPONSE_HEADERS) -> list:
+    """Return backend response headers as raw (name, value) pairs, minus the names in skip.
+
+    Starlette only takes a mapping for ``headers=``, so callers append the result
+    to ``Response.raw_headers`` directly instead of building a dict.
+    """
+    return [(k, v) for k, v in ((k.lower(), v) for k, v in headers.raw) if k not in skip]
 
 
 def load_config():
     """Load settings from the TOML config file."""
     try:
         config_path = Path(__file__).parent.parent / "config" / "settings.toml"
-        with open(config_path, "r") as f:
-            return tomlkit.load(f)
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
     except FileNotFoundError:
         print("❌ Configuration file 'config/settings.toml' not found.")
         sys.exit(1)
@@ -30,50 +68,75 @@ def load_config():
         sys.exit(1)
 
 
-def create_auth_proxy(
-    backend_port: int,
-    api_key: Optional[str] = None,
-    api_keys: Optional[list] = None,
-    filter_reasoning: bool = False,
-    service_name: Optional[str] = None,
-    service_model: Optional[str] = None,
-):
-    """Create FastAPI app that proxies requests with authentication.
+@dataclass(frozen=True, slots=True)
+class ProxyConfig:
+    """Settings for one auth proxy, resolved once from settings.toml at startup.
 
-    Args:
+    Attributes:
+        host: Host the proxy binds to
         backend_port: Port of the backend MLX service
-        api_key: Single API key (legacy)
-        api_keys: List of API keys (recommended)
+        valid_keys: Accepted API keys; empty means authentication is disabled
         filter_reasoning: If True, strip 'reasoning' field from responses (Qwen3-Thinking models)
+        service_name: Service this proxy fronts (e.g. "fast")
+        service_model: HF model id substituted for requests addressed to service_name
     """
-    app = FastAPI(title="MLX Auth Proxy")
-    backend_url = f"http://127.0.0.1:{backend_port}"
 
-    # Build list of valid keys (support both single api_key and multiple api_keys)
-    valid_keys = set()
-    if api_key:
-        valid_keys.add(api_key)
-    if api_keys:
-        valid_keys.update(api_keys)
-
-    async def verify_api_key(request: Request) -> bool:
-        """Verify the API key from Authorization header."""
-        if not valid_keys:
+    host: str
+    backend_port: int
+    valid_keys: frozenset[str] = frozenset()
+    filter_reasoning: bool = False
+    service_name: Optional[str] = None
+    service_model: Optional[str] = None
+
+
+def create_auth_proxy(cfg: ProxyConfig):
+    """Create FastAPI app that proxies requests with authentication."""
+    backend_url = f"http://127.0.0.1:{cfg.backend_port}"
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # One pooled client per proxy so requests reuse keep-alive connections to the backend
+        app.state.client = httpx.AsyncClient(
+            base_url=backend_url,
+            # Fail fast on connect, but never cut off a long-running generation mid-stream
+            timeout=httpx.Timeout(connect=2.0, read=None, write=30.0, pool=5.0),
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=256),
+        )
+        yield
+        await app.state.client.aclose()
+
+    app = FastAPI(title="MLX Auth Proxy", lifespan=lifespan)
+
+    # Authorization header -> verification result, so repeat clients skip re-validation
+    app.state.auth_cache = TTLCache(maxsize=1024, ttl=300)
+
+    def verify_api_key(request: Request) -> bool:
+        """Verify the API key from Authorization header.
+
+        Plain function rather than a coroutine: it does no I/O, so awaiting it
+        would only allocate a coroutine per request.
+        """
+        if not cfg.valid_keys:
             # No API keys configured, allow all requests
             return True
 
-        auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Bearer "):
+        auth_header = request.headers.get("Authorization")
+        if auth_header is None or not auth_header.startswith("Bearer "):
             return False
 
-        token = auth_header[7:]  # Remove "Bearer " prefix
-        return token in valid_keys
+        cached = request.app.state.auth_cache.get(auth_header)
+        if cached is not None:
+            return cached
+
+        valid = auth_header[7:] in cfg.valid_keys  # Remove "Bearer " prefix
+        request.app.state.auth_cache[auth_header] = valid
+        return valid
 
     @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD", "PATCH"])
     async def proxy(path: str, request: Request):
         """Forward all requests to backend MLX server after validating auth."""
         # Verify API key
-        if not await verify_api_key(request):
+        if not verify_api_key(request):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or missing API key",
@@ -81,121 +144,94 @@ def create_auth_proxy(
             )
 
         # Forward request to backend
-        url = f"{backend_url}/{path}"
-        headers = dict(request.headers)
-
-        # Remove host header to avoid conflicts
-        headers.pop("host", None)
-
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            try:
-                # Check if response should be streamed
+        url = f"/{path}"
+        # Drop host (to avoid conflicts) and hop-by-hop headers that would break backend keep-alive
+        headers = [(k, v) for k, v in request.headers.raw if k not in _SKIP_REQUEST_HEADERS]
+
+        client = request.app.state.client
+        try:
+            # If JSON, rewrite model to configured HF id for this service
+            if cfg.service_name and cfg.service_model and request.headers.get("content-type", "").startswith("application/json"):
+                # The rewrite needs the whole payload, so only this path buffers the body
                 body = await request.body()
-                headers = dict(headers)
-
-                # If JSON, rewrite model to configured HF id for this service
-                if service_name and service_model and headers.get("content-type", "").startswith("application/json"):
-                    try:
-                        import json
-
-                        payload = json.loads(body or b"{}")
-                        model = payload.get("model")
-                        if model in (service_name, "", None):
-                            payload["model"] = service_model
-                            body = json.dumps(payload).encode("utf-8")
-                    except Exception:
-                        # If parsing fails, forward original body as-is
-                        pass
+                try:
+                    payload = orjson.loads(body or b"{}")
+                    model = payload.get("model")
+                    if model in (cfg.service_name, "", None):
+                        payload["model"] = cfg.service_model
+                        body = orjson.dumps(payload)
+                except Exception:
+                    # If parsing fails, forward original body as-is
+                    pass
 
                 # Let httpx set Content-Length based on the body we pass
-                headers.pop("content-length", None)
-
-                response = await client.request(
+                headers = [(k, v) for k, v in headers if k != b"content-length"]
+            elif "content-length" in request.headers or "transfer-encoding" in request.headers:
+                # Stream the body through unchanged; the client's Content-Length still holds
+                body = request.stream()
+            else:
+                # No body (GET/HEAD/DELETE): a stream here would go out chunked, which
+                # the http.server-based mlx_lm backends cannot parse
+                body = None
+
+            response = await client.send(
+                client.build_request(
                     method=request.method,
                     url=url,
                     headers=headers,
                     content=body,
                     params=request.query_params,
+                ),
+                stream=True,
+            )
+            content_type = response.headers.get("content-type", "")
+
+            # Fast path: nothing to transform (SSE, non-JSON, or no reasoning filter),
+            # so forward the backend bytes untouched
+            if not cfg.filter_reasoning or not content_type.startswith("application/json"):
+                proxied = StreamingResponse(
+                    response.aiter_raw(),
+                    status_code=response.status_code,
+                    background=BackgroundTask(response.aclose),
                 )
+                proxied.raw_headers.extend(_filter_response_headers(response.headers))
+                return proxied
 
-                # Check if streaming response
-                if "text/event-stream" in response.headers.get("content-type", ""):
-                    async def stream_response():
-                        async for chunk in response.aiter_bytes():
-                            yield chunk
-
-                    return StreamingResponse(
-                        stream_response(),
-                        status_code=response.status_code,
-                        headers=dict(response.headers),
-                        media_type=response.headers.get("content-type"),
-                    )
-                else:
-                    # Return regular response
-                    if response.headers.get("content-type", "").startswith("application/json"):
-                        response_data = response.json()
-
-                        # Filter reasoning if configured
-                        if filter_reasoning and isinstance(response_data, dict):
-                            if "choices" in response_data:
-                                for choice in response_data["choices"]:
-                                    if isinstance(choice, dict) and "message" in choice:
-                                        message = choice["message"]
-
-                                        # Method 1: Remove separate reasoning field (legacy reasoning format)
-                                        if isinstance(message, dict) and "reasoning" in message:
-                                            del message["reasoning"]
-
-                                        # Method 2: Strip <think>...</think> tags from content (legacy format)
-                                        if isinstance(message, dict) and "content" in message:
-                                            content = message["content"]
-                                            if isinstance(content, str) and "<think>" in content:
-                                                import re
-
-                                                # Remove complete <think>...</think> blocks
-                                                filtered_content = re.sub(
-                                                    r'<think>.*?</think>\s*',
-                                                    '',
-                                                    content,
-                                                    flags=re.DOTALL
-                                                )
-
-                                                # Also remove incomplete <think> blocks (when response cuts off before </think>)
-                                                filtered_content = re.sub(
-                                                    r'<think>.*',
-                                                    '',
-                                                    filtered_content,
-                                                    flags=re.DOTALL
-                                                ).strip()
-
-                                                message["content"] = filtered_content
-
-                        # Don't pass Content-Length header - let FastAPI recalculate it
-                        response_headers = dict(response.headers)
-                        response_headers.pop("content-length", None)
-
-                        return JSONResponse(
-                            content=response_data,
-                            status_code=response.status_code,
-                            headers=response_headers,
-                        )
-                    else:
-                        # Also remove Content-Length for non-JSON responses
-                        response_headers = dict(response.headers)
-                        response_headers.pop("content-length", None)
-
-                        return Response(
-                            content=response.content,
-                            status_code=response.status_code,
-                            headers=response_headers,
-                            media_type=response.headers.get("content-type"),
-                        )
-
-            except httpx.RequestError as e:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"Backend service unavailable: {str(e)}",
-                )
+            # Only the reasoning filter needs the parsed payload
+            response_data = orjson.loads(await response.aread())
+
+            if isinstance(response_data, dict):
+                if "choices" in response_data:
+                    for choice in response_data["choices"]:
+                        if isinstance(choice, dict) and "message" in choice:
+                            message = choice["message"]
+
+                            # Method 1: Remove separate reasoning field (legacy reasoning format)
+                            if isinstance(message, dict) and "reasoning" in message:
+                                del message["reasoning"]
+
+                            # Method 2: Strip <think>...</think> tags from content (legacy format)
+                            if isinstance(message, dict) and "content" in message:
+                                content = message["content"]
+                                if isinstance(content, str) and "<think>" in content:
+                                    # Remove complete <think>...</think> blocks
+                                    filtered_content = _THINK_RE.sub('', content)
+
+                                    # Also remove incomplete <think> blocks (when response cuts off before </think>)
+                                    filtered_content = _UNCLOSED_THINK_RE.sub('', filtered_content).strip()
+
+                                    message["content"] = filtered_content
+
+            # ORJSONResponse sets its own Content-Type and Content-Length for the rewritten body
+            proxied = ORJSONResponse(content=response_data, status_code=response.status_code)
+            proxied.raw_headers.extend(_filter_response_headers(response.headers, _SKIP_REWRITTEN_HEADERS))
+            return proxied
+
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Backend service unavailable: {str(e)}",
+            )
 
     return app
 
@@ -232,48 +268,54 @@ def main():
     api_key = server_config.get("api_key")  # Old single key format
     api_keys = server_config.get("api_keys")  # New multiple keys format
 
+    # Build set of valid keys (support both single api_key and multiple api_keys)
+    valid_keys = set()
+    if api_key:
+        valid_keys.add(api_key)
+    if api_keys:
+        valid_keys.update(api_keys)
+
     # Check if this service should filter reasoning field
     service_config = config.get("services", {}).get(args.service, {})
-    filter_reasoning = service_config.get("filter_reasoning", False)
 
-    # Count total valid keys
-    total_keys = 0
-    if api_key:
-        total_keys += 1
-    if api_keys:
-        total_keys += len(api_keys)
+    cfg = ProxyConfig(
+        host=host,
+        backend_port=args.backend_port,
+        valid_keys=frozenset(valid_keys),
+        filter_reasoning=bool(service_config.get("filter_reasoning", False)),
+        service_name=args.service,
+        service_model=service_config.get("model"),
+    )
+    total_keys = len(cfg.valid_keys)
 
+    # Emit the startup banner in a single write so it stays intact in shared logs
+    banner = []
     if total_keys > 0:
-        print(f"🔐 Authentication enabled for {args.service} service ({total_keys} key(s) configured)")
+        banner.append(f"🔐 Authentication enabled for {args.service} service ({total_keys} key(s) configured)")
     else:
-        print(f"⚠️  WARNING: No API key configured - running without authentication")
+        banner.append(f"⚠️  WARNING: No API key configured - running without authentication")
 
-    if filter_reasoning:
-        print(f"🧠 Reasoning filter enabled - 'reasoning' field will be stripped from responses")
+    if cfg.filter_reasoning:
+        banner.append(f"🧠 Reasoning filter enabled - 'reasoning' field will be stripped from responses")
 
-    print(f"🚀 Starting auth proxy for {args.service.upper()} service")
-    print(f"📍 Auth proxy: http://{host}:{args.auth_port}")
-    print(f"🔗 Backend: http://{host}:{args.backend_port}")
-    print()
+    banner.append(f"🚀 Starting auth proxy for {args.service.upper()} service")
+    banner.append(f"📍 Auth proxy: http://{host}:{args.auth_port}")
+    banner.append(f"🔗 Backend: http://{host}:{args.backend_port}")
+    sys.stdout.write("\n".join(banner) + "\n\n")
+    sys.stdout.flush()
 
     # Create and run proxy
-    service_model = service_config.get("model")
-    app = create_auth_proxy(
-        args.backend_port,
-        api_key,
-        api_keys,
-        filter_reasoning,
-        service_name=args.service,
-        service_model=service_model,
-    )
+    app = create_auth_proxy(cfg)
 
-    # Disable uvloop for OpenAI SDK compatibility
+    # The proxy is pure server-side I/O; the OpenAI SDK uvloop issue only affects the
+    # mlx_lm backends (see patched_mlx_server_no_uvloop.py), not this process
     uvicorn.run(
         app,
-        host=host,
+        host=cfg.host,
         port=args.auth_port,
         log_level="info",
-        loop="asyncio",
+        loop="uvloop",
+        http="httptools",
     )
 
 
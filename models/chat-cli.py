@@ -4,8 +4,9 @@ Interactive Command-Line Chat for MLX Server
 """
 
 import requests
-import json
+import orjson
 import sys
+from collections import deque
 from pathlib import Path
 import tomllib
 
@@ -25,13 +26,30 @@ HOST = server.get("host", "127.0.0.1")
 PORT = services.get("fast", {}).get("port", 8081)
 SERVER_URL = f"http://{HOST}:{PORT}/v1"
 
+# Shared session so every turn reuses the same keep-alive connection
+SESSION = requests.Session()
+
+# Client-side history window; older turns would be truncated by the server anyway
+MAX_HISTORY_MESSAGES = 32
+MAX_HISTORY_TOKENS = 8192  # Rough estimate at ~4 characters per token
+
+# Streamed tokens are flushed to the terminal in small groups instead of one by one
+FLUSH_EVERY = 8
+
+
+def trim_history(messages):
+    """Drop the oldest messages until the estimated prompt fits MAX_HISTORY_TOKENS."""
+    tokens = sum(len(m["content"]) // 4 for m in messages)
+    while len(messages) > 1 and tokens > MAX_HISTORY_TOKENS:
+        tokens -= len(messages.popleft()["content"]) // 4
+
 def get_model_name():
     """
     Fetches an appropriate chat model from the server.
     Prefers a model with 'instruct' in the name.
     """
     try:
-        response = requests.get(f"{SERVER_URL}/models", timeout=10)
+        response = SESSION.get(f"{SERVER_URL}/models", timeout=10)
         response.raise_for_status()
         data = response.json()
         models = data.get("data", [])
@@ -59,7 +77,7 @@ def get_model_name():
 
 def interactive_chat(model_name):
     """Main function to run the interactive chat loop."""
-    messages = []
+    messages = deque(maxlen=MAX_HISTORY_MESSAGES)
     print("=====================================================")
     print(f"  Interactive Chat with: {model_name}")
     print("=====================================================")
@@ -74,39 +92,44 @@ def interactive_chat(model_name):
                 break
 
             messages.append({"role": "user", "content": user_input})
+            trim_history(messages)
 
             print("Bot: ", end="", flush=True)
             
             # Prepare request data
             request_data = {
                 "model": model_name,
-                "messages": messages,
+                "messages": list(messages),
                 "stream": True,
                 "max_tokens": 2048,
             }
 
             # Send request and handle streaming response
-            full_response = ""
-            with requests.post(f"{SERVER_URL}/chat/completions", json=request_data, stream=True) as response:
+            parts = []
+            out = sys.stdout.buffer
+            with SESSION.post(f"{SERVER_URL}/chat/completions", json=request_data, stream=True) as response:
                 response.raise_for_status()
-                for chunk in response.iter_lines():
-                    if chunk:
-                        decoded_chunk = chunk.decode('utf-8')
-                        if decoded_chunk.startswith('data: '):
-                            json_str = decoded_chunk[6:]
-                            if json_str.strip() == '[DONE]':
-                                break
-                            try:
-                                data = json.loads(json_str)
-                                delta = data["choices"][0].get("delta", {}).get("content", "")
-                                if delta:
-                                    print(delta, end="", flush=True)
-                                    full_response += delta
-                            except json.JSONDecodeError:
-                                # Ignore malformed data chunks
-                                pass
+                # Work on raw bytes; orjson parses them without a decode step
+                for chunk in response.iter_lines(decode_unicode=False):
+                    if chunk.startswith(b'data: '):
+                        payload = chunk[6:]
+                        if payload.strip() == b'[DONE]':
+                            break
+                        try:
+                            data = orjson.loads(payload)
+                            delta = data["choices"][0].get("delta", {}).get("content", "")
+                            if delta:
+                                out.write(delta.encode("utf-8"))
+                                parts.append(delta)
+                                if len(parts) % FLUSH_EVERY == 0 or delta[-1] in ".\n":
+                                    out.flush()
+                        except orjson.JSONDecodeError:
+                            # Ignore malformed data chunks
+                            pass
             
+            out.flush()
             print() # Newline after bot finishes
+            full_response = "".join(parts)
             if full_response:
                 messages.append({"role": "assistant", "content": full_response})
 
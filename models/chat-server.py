@@ -4,21 +4,26 @@ MLX Chat Server - Multi-Tier Architecture Support
 Supports: Router, Fast, and Thinking service tiers
 """
 
-import subprocess
+import atexit
+import os
 import sys
+import threading
 import argparse
+import random
+import socket
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
-import tomlkit
+import tomllib
 
 # --- Configuration Loading ---
 def load_config():
     """Load settings from the TOML config file."""
     try:
         config_path = Path(__file__).parent.parent / "config" / "settings.toml"
-        with open(config_path, "r") as f:
-            return tomlkit.load(f)
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
     except FileNotFoundError:
         print("❌ Configuration file 'config/settings.toml' not found.")
         print("   Please copy 'config/settings.toml.example' to 'config/settings.toml' and customize it.")
@@ -29,6 +34,11 @@ def load_config():
 
 # --- End Configuration Loading ---
 
+# Single keep-alive connection reused by every readiness probe
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+atexit.register(SESSION.close)
+
 
 def check_mlx_available():
     """Check if MLX is available on this system"""
@@ -39,22 +49,35 @@ def check_mlx_available():
     except ImportError:
         return False
 
+def port_open(host, port, timeout=1.0):
+    """Check whether something is accepting TCP connections on host:port"""
+    try:
+        socket.create_connection((host, port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
 def wait_for_server(host, port, timeout=300):
     """Wait for the server to become available"""
     print(f"Waiting for server at http://{host}:{port}...")
     start_time = time.time()
-    
+    delay = 0.05
+
+    # Quick first check, backing off to 2s (jittered). Probe the TCP port (liveness) and
+    # only confirm the model with a GET once something is listening (readiness)
     while time.time() - start_time < timeout:
-        try:
-            response = requests.get(f"http://{host}:{port}/v1/models", timeout=5)
-            if response.status_code == 200:
-                print("✅ Server is ready!")
-                return True
-        except requests.exceptions.RequestException:
-            pass
-        
-        time.sleep(2)
-    
+        if port_open(host, port):
+            try:
+                response = SESSION.get(f"http://{host}:{port}/v1/models", timeout=1)
+                if response.status_code == 200:
+                    print("✅ Server is ready!")
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * 2, 2.0)
+
     return False
 
 def main():
@@ -100,15 +123,17 @@ def main():
         print("❌ MLX not available. Install with: poetry add mlx mlx-lm")
         sys.exit(1)
     
-    print(f"🚀 Starting MLX server for Tier: {service_name.upper()}")
-    print(f"📦 Model: {model_name}")
-    print(f"📍 Address: http://{host}:{port}")
-    print(f"🔄 This will download the model on first run if not cached.")
-    print()
+    # Emit the startup banner in a single write so it stays intact in shared logs
+    sys.stdout.write("\n".join([
+        f"🚀 Starting MLX server for Tier: {service_name.upper()}",
+        f"📦 Model: {model_name}",
+        f"📍 Address: http://{host}:{port}",
+        f"🔄 This will download the model on first run if not cached.",
+    ]) + "\n\n")
+    sys.stdout.flush()
     
-    # Build command for mlx_lm.server
-    # Use patched server without uvloop for OpenAI SDK compatibility
-    cmd = [sys.executable, "patched_mlx_server_no_uvloop.py"]
+    # Build arguments for mlx_lm.server
+    cmd = ["mlx_lm.server"]
 
     cmd.extend([
         "--model", model_name,
@@ -123,7 +148,7 @@ def main():
     if top_p is not None:
         cmd.extend(["--top-p", str(top_p)])
 
-    # Note: repetition_penalty and presence_penalty not supported by patched_mlx_server.py
+    # Note: repetition_penalty and presence_penalty not supported by patched_mlx_server_no_uvloop.py
     # These would need to be handled at the application level or added to the patched server
 
     # Add chat template arguments for thinking models (requires mlx-lm >= 0.30.6)
@@ -132,40 +157,37 @@ def main():
         cmd.extend(["--chat-template-args", '{"enable_thinking":false}'])
         print(f"🧠 Thinking tags disabled for {service_name} service")
 
-    # Add kv-cache-quant for larger models to save RAM
-    # Apply to fast and thinking models (typically 30B+)
-    # Note: Disabled again as it causes errors on server startup even with latest deps
-    # if service_name in ["fast", "thinking"]:
-    #      cmd.extend(["--kv-cache-quant", "8bit"])
+    # The KV cache is quantized to 8 bits by patched_mlx_server_no_uvloop.py, not a CLI flag
 
-    print(f"Running: {' '.join(cmd)}")
+    print(f"Running in-process: {' '.join(cmd)}")
     print("=" * 50)
-    
-    # Start server process
-    try:
-        process = subprocess.Popen(cmd)
-        
-        # Wait for server to be ready
+
+    def report_ready():
+        """Announce readiness from a side thread while the server owns the main thread"""
         if wait_for_server(host, port):
             print()
             print(f"🎉 {service_name.upper()} server is ready!")
             print(f"🔗 Endpoint: http://{host}:{port}/v1/chat/completions")
             print()
-            
-            # Keep server running
-            process.wait()
-            
         else:
             print("❌ Server failed to start or become ready")
-            process.terminate()
-            sys.exit(1)
-            
+            os._exit(1)
+
+    # Run mlx_lm's server in this interpreter instead of spawning a second Python process.
+    # Importing the patch module disables uvloop for OpenAI SDK compatibility and
+    # turns on the 8-bit KV cache
+    try:
+        import patched_mlx_server_no_uvloop  # noqa: F401
+        from mlx_lm import server as mlx_server
+
+        threading.Thread(target=report_ready, daemon=True).start()
+        sys.argv = cmd
+        mlx_server.main()
+
     except KeyboardInterrupt:
         print("\n🛑 Shutting down server...")
-        process.terminate()
-        process.wait()
         print("✅ Server stopped")
-        
+
     except Exception as e:
         print(f"❌ Error starting server: {e}")
         sys.exit(1)
@@ -3,26 +3,50 @@
 Apple Silicon optimized embedding server for Qwen3 models
 """
 
+import os
+
+# Let the Rust tokenizer use its own thread pool; must be set before tokenizers is imported
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer
 import uvicorn
 import torch
 import numpy as np
+import orjson
 from typing import List, Union, Optional
 from contextlib import asynccontextmanager
+import asyncio
+import base64
+import hashlib
+import ctypes
 import logging
-import tomlkit
+import time
+from collections import OrderedDict
+import tomllib
 import sys
 from pathlib import Path
 
+try:
+    import numba
+except ImportError:  # Optional: quantize_per_dim falls back to NumPy ufuncs
+    numba = None
+
 # --- Configuration Loading ---
+# Parsed settings keyed by (path, mtime), so repeat loads in one process skip the parse
+_CFG_CACHE: dict = {}
+
 def load_config():
     """Load settings from the TOML config file."""
     try:
         config_path = Path(__file__).parent.parent / "config" / "settings.toml"
-        with open(config_path, "r") as f:
-            return tomlkit.load(f)
+        key = (str(config_path), config_path.stat().st_mtime)
+        if key not in _CFG_CACHE:
+            with open(config_path, "rb") as f:
+                _CFG_CACHE[key] = tomllib.load(f)
+        return _CFG_CACHE[key]
     except FileNotFoundError:
         logging.error("❌ Configuration file 'config/settings.toml' not found.")
         logging.error("   Please copy 'config/settings.toml.example' to 'config/settings.toml' and customize it.")
@@ -50,13 +74,285 @@ port = embed_config.get("backend_port") or embed_config.get("port", 8084)
 batch_size = embed_config.get("batch_size", 64)
 max_seq_length = embed_config.get("max_seq_length", 1024)
 use_quantization = embed_config.get("quantization", True)  # int8 by default
+# Power-law saturation applied before int8 quantization (1 disables)
+quant_power = float(embed_config.get("quantization_power", 2.0))
+# Optional .npz holding the per-dimension int8 ranges; written on first start, reused after,
+# so codes stay comparable across restarts (otherwise they are recalibrated every start)
+quant_ranges_path = embed_config.get("quantization_ranges")
+quant_ranges_path = quant_ranges_path and os.path.expanduser(quant_ranges_path)
+# Optional extra calibration texts, one per line, appended to CALIBRATION_TEXTS
+quant_calibration_file = embed_config.get("quantization_calibration_file")
+quant_calibration_file = quant_calibration_file and os.path.expanduser(quant_calibration_file)
+# How long the batcher waits for more concurrent requests before encoding
+batch_window = embed_config.get("batch_window_ms", 5) / 1000
+# Responses with at least this many embeddings are streamed row by row instead of
+# being serialized into one large body
+stream_threshold = embed_config.get("stream_threshold", 256)
+# Opt-in half-precision weights on MPS (falls back to float32 if an op is unsupported)
+mps_fp16 = embed_config.get("mps_fp16", False)
+# Opt-in torch.compile of the transformer (inductor support on MPS is still maturing)
+use_torch_compile = embed_config.get("torch_compile", False)
+# "torch" (default) or "onnx": run the encoder through onnxruntime, preferring the CoreML EP
+backend = embed_config.get("backend", "torch")
+# Where the ONNX export is saved so only the first start pays for it
+onnx_cache_dir = Path(embed_config.get("onnx_cache_dir", Path.home() / ".cache" / "mlx-box" / "onnx")).expanduser()
+# Opt-in startup sweep that picks the fastest batch size per input length
+autotune_batch = embed_config.get("autotune_batch_size", False)
 host = server_config.get("host", "127.0.0.1")
 
+# LRU of text digest -> float32 embedding, so repeated inputs skip the model (0 disables)
+cache_size = embed_config.get("cache_size", 10000)
+embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+
+# Micro-batching: requests queue (texts, future) pairs that batch_worker coalesces
+embed_queue: Optional[asyncio.Queue] = None
+
+# (max tokens, batch size) pairs found by autotune_batch_size, ascending by length
+batch_size_by_length: List[tuple] = []
+
+# Reusable [batch_size, D] float32 / int8 working buffers for quantize_per_dim
+quant_scratch: Optional[np.ndarray] = None
+quant_codes: Optional[np.ndarray] = None
+
+# Fixed per-dimension int8 ranges (after saturation), shared by every request and
+# published at /v1/quantization, so codes from different requests live in one code space
+quant_min: Optional[np.ndarray] = None
+quant_scale: Optional[np.ndarray] = None
+
+# Built-in calibration corpus: short and long, prose, queries, code, and a few languages
+CALIBRATION_TEXTS = (
+    "hello",
+    "What is the capital of France?",
+    "how to reset a forgotten password",
+    "best hiking trails near me with waterfalls",
+    "The mitochondria is the powerhouse of the cell, producing ATP through oxidative phosphorylation.",
+    "Quarterly revenue grew 12% year over year, driven mainly by subscription renewals in Europe.",
+    "The defendant filed a motion to dismiss for lack of personal jurisdiction.",
+    "Preheat the oven to 200°C, then roast the vegetables for 25 minutes until golden.",
+    "Take one tablet twice daily with food. Do not exceed the recommended dose.",
+    "def fibonacci(n):\n    a, b = 0, 1\n    for _ in range(n):\n        a, b = b, a + b\n    return a",
+    "SELECT user_id, COUNT(*) FROM orders WHERE created_at > NOW() - INTERVAL '7 days' GROUP BY user_id;",
+    "TypeError: 'NoneType' object is not subscriptable",
+    "git rebase --onto main feature-branch",
+    "Le chat dort sur le canapé depuis ce matin.",
+    "Die Bahn hat heute wieder Verspätung wegen Bauarbeiten.",
+    "¿Dónde está la estación de tren más cercana?",
+    "東京は日本の首都であり、世界有数の大都市です。",
+    "人工智能正在改变我们的工作方式。",
+    "Москва — столица России.",
+    "1, 2, 3, 5, 8, 13, 21, 34, 55, 89",
+    "https://example.com/docs/api/v2/embeddings?format=json",
+    "Meeting notes: discussed the roadmap, assigned owners, follow up next Tuesday.",
+    "It was the best of times, it was the worst of times, it was the age of wisdom, it was the age of "
+    "foolishness, it was the epoch of belief, it was the epoch of incredulity, it was the season of Light, "
+    "it was the season of Darkness, it was the spring of hope, it was the winter of despair.",
+    "Photosynthesis converts light energy into chemical energy. In the light-dependent reactions, water is "
+    "split and oxygen released; in the Calvin cycle, carbon dioxide is fixed into sugars using ATP and NADPH "
+    "produced earlier. The overall efficiency is low, yet it sustains nearly all life on Earth.",
+)
+# Calibration only sees a small sample, so each range is widened by this fraction per side;
+# values outside it saturate to the end codes
+CALIBRATION_MARGIN = 0.1
+
+
+def batch_size_for(texts: List[str]) -> int:
+    """Pick the tuned batch size for the longest text (~4 chars/token), else the configured one."""
+    if not batch_size_by_length:
+        return batch_size
+    longest = max(len(text) for text in texts) // 4
+    for length, tuned in batch_size_by_length:
+        if longest <= length:
+            return tuned
+    return batch_size_by_length[-1][1]
+
+
+def encode(texts: List[str], encode_batch_size: Optional[int] = None) -> np.ndarray:
+    """Run model.encode without autograd bookkeeping.
+
+    inference_mode is thread-local, so it is entered here, inside the worker thread.
+    """
+    with torch.inference_mode():
+        embeddings = model.encode(
+            texts,
+            batch_size=encode_batch_size or batch_size_for(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+    # An fp16 model yields fp16 rows; quantization and caching expect float32
+    return embeddings.astype(np.float32, copy=False)
+
+
+def autotune_batch_size() -> List[tuple]:
+    """Time encode over batch sizes x input lengths and keep the best tokens/s per length."""
+    encode(["warmup"], 1)
+    table = []
+    for length in (32, 128, 512, 2048):
+        length = min(length, max_seq_length)
+        best = None
+        for candidate in (8, 16, 32, 64, 128):
+            # "x x x ..." tokenizes to roughly one token per repetition
+            texts = ["x " * length] * candidate
+            start = time.perf_counter()
+            try:
+                encode(texts, candidate)
+            except RuntimeError as e:
+                # MPS out-of-memory surfaces as RuntimeError; larger batches would fail too
+                logger.warning(f"   Autotune: batch {candidate} x {length} tokens failed ({e}); stopping here")
+                if torch.backends.mps.is_available():
+                    torch.mps.empty_cache()
+                break
+            rate = candidate * length / (time.perf_counter() - start)
+            if best is None or rate > best[0]:
+                best = (rate, candidate)
+        if best:
+            table.append((length, best[1]))
+            logger.info(f"   Autotune: <= {length} tokens -> batch {best[1]} ({best[0]:.0f} tokens/s)")
+        if length == max_seq_length:
+            break
+    return table
+
+
+async def batch_worker():
+    """Coalesce queued requests into single model.encode calls and scatter the results."""
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await embed_queue.get()]
+        pending_texts = len(items[0][0])
+        deadline = loop.time() + batch_window
+
+        # Gather more requests until the window closes or a full batch is ready
+        while pending_texts < batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(embed_queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            pending_texts += len(item[0])
+
+        flat = [text for texts, _ in items for text in texts]
+        try:
+            # Encode off the event loop so /health and request parsing keep flowing;
+            # the single worker still serializes model access
+            embeddings = await asyncio.to_thread(encode, flat)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        offset = 0
+        for texts, future in items:
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(texts)])
+            offset += len(texts)
+
+
+async def encode_batched(texts: List[str]) -> np.ndarray:
+    """Queue texts for the batch worker and wait for their embeddings."""
+    future = asyncio.get_running_loop().create_future()
+    await embed_queue.put((texts, future))
+    return await future
+
+
+async def encode_cached(texts: List[str]) -> np.ndarray:
+    """Embed texts, serving repeats from the LRU cache and encoding only the misses."""
+    if not cache_size:
+        return await encode_batched(texts)
+
+    # blake2b is fast and a 16-byte digest keeps keys small without practical collisions
+    keys = [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for text in texts]
+    rows = [embedding_cache.get(key) for key in keys]
+    miss_idx = [i for i, row in enumerate(rows) if row is None]
+
+    for key, row in zip(keys, rows):
+        if row is not None:
+            embedding_cache.move_to_end(key)
+
+    if not miss_idx:
+        return np.stack(rows)
+
+    fresh = await encode_batched([texts[i] for i in miss_idx])
+    for j, i in enumerate(miss_idx):
+        # Copy so cached rows don't pin the whole batch array in memory
+        embedding_cache[keys[i]] = fresh[j].copy()
+    while len(embedding_cache) > cache_size:
+        embedding_cache.popitem(last=False)
+
+    if len(miss_idx) == len(texts):
+        return fresh
+
+    # Mixed hits and misses: fill one preallocated contiguous buffer
+    out = np.empty((len(texts), fresh.shape[1]), dtype=fresh.dtype)
+    out[miss_idx] = fresh
+    for i, row in enumerate(rows):
+        if row is not None:
+            out[i] = row
+    return out
+
+
+def load_model(device: str) -> SentenceTransformer:
+    """Load the SentenceTransformer on the configured backend, falling back to torch."""
+    if backend == "onnx":
+        try:
+            # Export once, then load the saved ONNX weights on later starts; pooling and
+            # normalization still come from the model's own SentenceTransformer config
+            export_dir = onnx_cache_dir / model_name.replace("/", "--")
+            exported = (export_dir / "onnx" / "model.onnx").is_file()
+            onnx_model = SentenceTransformer(
+                str(export_dir) if exported else model_name,
+                backend="onnx",
+                trust_remote_code=True,
+                model_kwargs={"provider": "CoreMLExecutionProvider"}
+            )
+            if not exported:
+                try:
+                    onnx_model.save_pretrained(str(export_dir))
+                    logger.info(f"   Saved ONNX export to {export_dir}")
+                except OSError as e:
+                    logger.warning(f"ONNX export not saved, next start exports again: {e}")
+            logger.info("   Backend: onnxruntime (CoreML EP, CPU fallback)")
+            return onnx_model
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable, using torch: {e}")
+
+    if device == "mps" and mps_fp16:
+        try:
+            half_model = SentenceTransformer(
+                model_name,
+                device=device,
+                trust_remote_code=True,
+                model_kwargs={"torch_dtype": torch.float16}
+            )
+            # Unsupported MPS ops only surface on a forward pass
+            with torch.inference_mode():
+                half_model.encode(["warmup"], convert_to_numpy=True, show_progress_bar=False)
+            logger.info("Using float16 dtype on MPS")
+            return half_model
+        except Exception as e:
+            logger.warning(f"float16 on MPS failed, using float32: {e}")
+
+    # Load model with trust_remote_code=True for Qwen models
+    # Force float32 to avoid BFloat16 issues on MPS
+    model_kwargs = {}
+    if device == "mps":
+        model_kwargs = {"torch_dtype": torch.float32}
+        logger.info("Using float32 dtype for MPS compatibility")
+
+    return SentenceTransformer(
+        model_name,
+        device=device,
+        trust_remote_code=True,
+        model_kwargs=model_kwargs
+    )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global model, model_name
+    global model, model_name, embed_queue, quant_scratch, quant_codes, quant_min, quant_scale
 
     if not model_name:
         logger.error("❌ Model name not specified in 'config/settings.toml' under [services.embedding].")
@@ -70,25 +366,33 @@ async def lifespan(app: FastAPI):
     # Optimize for Apple Silicon
     device = "mps" if torch.backends.mps.is_available() else "cpu"
     logger.info(f"Using device: {device}")
+    if device == "cpu":
+        # Use every core for the CPU forward pass rather than torch's conservative default
+        torch.set_num_threads(os.cpu_count())
 
-    # Load model with trust_remote_code=True for Qwen models
-    # Force float32 to avoid BFloat16 issues on MPS
-    model_kwargs = {}
-    if device == "mps":
-        model_kwargs = {"torch_dtype": torch.float32}
-        logger.info("Using float32 dtype for MPS compatibility")
-
-    model = SentenceTransformer(
-        model_name,
-        device=device,
-        trust_remote_code=True,
-        model_kwargs=model_kwargs
-    )
+    model = load_model(device)
 
     # Configure max sequence length (Qwen3-Embedding supports up to 32k)
     # Using 1024 for optimal balance of context and performance
     model.max_seq_length = max_seq_length
 
+    # Inference only: no dropout, no gradients
+    model.eval()
+    model.requires_grad_(False)
+
+    if use_torch_compile and getattr(model, "backend", "torch") == "torch":
+        inner = model._first_module().auto_model
+        eager_forward = inner.forward
+        try:
+            inner.forward = torch.compile(eager_forward, dynamic=True)
+            # Compile now, over short and long inputs, rather than on the first requests
+            for length in (8, max_seq_length):
+                encode(["warmup " * length])
+            logger.info("   torch.compile: enabled")
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable, using eager mode: {e}")
+            inner.forward = eager_forward
+
     logger.info(f"✅ Qwen3 model loaded successfully")
     logger.info(f"   Actual dimensions: {model.get_sentence_embedding_dimension()}")
     logger.info(f"   Max sequence length: {model.max_seq_length}")
@@ -97,29 +401,177 @@ async def lifespan(app: FastAPI):
         logger.info(f"   Output quantization: int8 (75% space savings, ~99% accuracy)")
     else:
         logger.info(f"   Output quantization: disabled (full fp32 precision)")
-    
+
+    if autotune_batch:
+        batch_size_by_length[:] = autotune_batch_size()
+
+    quant_scratch = np.empty((batch_size, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    quant_codes = np.empty(quant_scratch.shape, dtype=np.int8)
+    quant_min, quant_scale = calibrate_quantization(quant_scratch.shape[1])
+
+    # One full-batch encode (and quantize, which may JIT) so the first request sees
+    # steady-state latency rather than lazy kernel compilation and allocator growth
+    start = time.perf_counter()
+    quantize_per_dim(encode(["warmup"] * batch_size, batch_size))
+    logger.info(f"   Warmup: {time.perf_counter() - start:.2f}s")
+
+    embed_queue = asyncio.Queue()
+    worker = asyncio.create_task(batch_worker())
+    logger.info(f"   Micro-batching window: {batch_window * 1000:.0f} ms")
+    logger.info(f"   Embedding cache: {cache_size} entries" if cache_size else "   Embedding cache: disabled")
+
     yield
-    
+
     # Shutdown
+    worker.cancel()
     logger.info("Shutting down embedding server")
 
 app = FastAPI(
     title="Qwen3 Embedding Server", 
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 class EmbeddingRequest(BaseModel):
+    # The server only hosts one model, so the client's "model" field is ignored, not validated
+    model_config = {"extra": "ignore"}
+
     input: Union[str, List[str]]
-    model: str = model_name
-    encoding_format: str = "float"
+    encoding_format: str = "float"  # "float", "base64" (fp32), or compact "float16" / "int8" / "int8_float16"
     prefix: Optional[str] = "passage"  # "passage" for documents, "query" for search queries 
 
-class EmbeddingResponse(BaseModel):
-    object: str = "list"
-    data: List[dict]
-    model: str
-    usage: dict
+
+def _b64(array: np.ndarray) -> str:
+    """Base64-encode the raw bytes of a numpy array."""
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _quantize_kernel(x, inv_power, min_val, inv_scale, codes):
+        """Saturate and quantize rows in parallel against fixed per-dim ranges, in one pass."""
+        n, d = x.shape
+        for i in numba.prange(n):
+            for j in range(d):
+                v = x[i, j]
+                if inv_power != 1.0:
+                    v = np.copysign(np.abs(v) ** inv_power, v)
+                q = np.round((v - min_val[j]) * inv_scale[j]) - 128
+                codes[i, j] = min(max(q, -128), 127)
+else:
+    _quantize_kernel = None
+
+
+def saturate(embeddings: np.ndarray) -> np.ndarray:
+    """sign(x) * |x| ** (1 / quant_power), the transform int8 codes are taken in."""
+    if quant_power == 1:
+        return embeddings
+    return np.copysign(np.abs(embeddings) ** (1.0 / quant_power), embeddings)
+
+
+def calibration_texts() -> List[str]:
+    """CALIBRATION_TEXTS plus the optional calibration file, each as passage and query."""
+    texts = list(CALIBRATION_TEXTS)
+    if quant_calibration_file:
+        with open(quant_calibration_file, encoding="utf-8") as f:
+            texts += [line.strip() for line in f if line.strip()]
+    return [f"{prefix}: {text}" for prefix in ("passage", "query") for text in texts]
+
+
+def calibrate_quantization(dimensions: int):
+    """Return the fixed (min, scale) int8 ranges, loading them from quant_ranges_path if possible.
+
+    Ranges are computed from the calibration corpus on first start and, when a path is
+    configured, saved there so later starts (and their codes) reuse the same ranges.
+    """
+    if quant_ranges_path and os.path.isfile(quant_ranges_path):
+        try:
+            with np.load(quant_ranges_path, allow_pickle=False) as saved:
+                min_val, scale = saved["min"], saved["scale"]
+                same = str(saved["model"]) == model_name and float(saved["power"]) == quant_power
+            if same and min_val.shape == (dimensions,):
+                logger.info(f"   Quantization ranges: {quant_ranges_path}")
+                return min_val.astype(np.float32), scale.astype(np.float32)
+            logger.warning(f"{quant_ranges_path} was made for another model or power; recalibrating")
+        except Exception as e:
+            logger.warning(f"Could not read {quant_ranges_path}, recalibrating: {e}")
+
+    texts = calibration_texts()
+    sample = saturate(encode(texts))
+    low, high = sample.min(axis=0), sample.max(axis=0)
+    margin = (high - low) * CALIBRATION_MARGIN
+    min_val = (low - margin).astype(np.float32)
+    scale = np.maximum((high - low + 2 * margin) / 255, 1e-12).astype(np.float32)
+    logger.info(f"   Quantization ranges: calibrated on {len(texts)} texts")
+
+    if quant_ranges_path:
+        try:
+            os.makedirs(os.path.dirname(quant_ranges_path) or ".", exist_ok=True)
+            with open(quant_ranges_path, "wb") as f:
+                np.savez(f, min=min_val, scale=scale, power=np.float32(quant_power), model=np.str_(model_name))
+        except OSError as e:
+            logger.warning(f"Could not save quantization ranges to {quant_ranges_path}: {e}")
+    return min_val, scale
+
+
+def quantize_per_dim(embeddings: np.ndarray) -> np.ndarray:
+    """Affine int8 quantization against the fixed per-dimension ranges.
+
+    Values are first saturated with sign(x) * |x| ** (1 / quant_power), which spends
+    more codes on small magnitudes, then clipped into the calibrated range. Clients
+    fetch min / scale once from /v1/quantization and dequantize with
+    y = (codes + 128) * scale + min, then embedding ≈ sign(y) * |y| ** quant_power.
+
+    The returned codes may be a view into a shared scratch buffer: serialize them
+    before the next call (i.e. before the handler awaits anything).
+    """
+    n = len(embeddings)
+    if quant_scratch is not None and n <= len(quant_scratch) and embeddings.shape[1] == quant_scratch.shape[1]:
+        work, codes = quant_scratch[:n], quant_codes[:n]
+    else:
+        work = np.empty(embeddings.shape, dtype=np.float32)
+        codes = np.empty(embeddings.shape, dtype=np.int8)
+
+    if _quantize_kernel is not None:
+        # One pass over the matrix instead of one per NumPy ufunc
+        _quantize_kernel(
+            np.ascontiguousarray(embeddings, dtype=np.float32), 1.0 / quant_power, quant_min, 1.0 / quant_scale, codes
+        )
+        return codes
+
+    # Every step writes into work, so the request allocates nothing
+    src = embeddings
+    if quant_power != 1:
+        np.abs(embeddings, out=work)
+        np.power(work, 1.0 / quant_power, out=work)
+        np.copysign(work, embeddings, out=work)
+        src = work
+    np.subtract(src, quant_min, out=work)
+    np.divide(work, quant_scale, out=work)
+    np.subtract(work, 128, out=work)
+    np.round(work, out=work)
+    np.clip(work, -128, 127, out=work)
+    np.copyto(codes, work, casting="unsafe")
+    return codes
+
+
+# Rows serialized per streamed chunk
+STREAM_CHUNK_ROWS = 64
+
+
+def stream_embedding_response(data: List[dict], tail: dict) -> StreamingResponse:
+    """Emit the OpenAI list response in groups of rows (chunked transfer)."""
+    async def body():
+        yield b'{"object":"list","data":['
+        for start in range(0, len(data), STREAM_CHUNK_ROWS):
+            rows = data[start:start + STREAM_CHUNK_ROWS]
+            chunk = b",".join(orjson.dumps(item, option=orjson.OPT_SERIALIZE_NUMPY) for item in rows)
+            yield (b"," + chunk) if start else chunk
+        # Close the data array, then splice in the remaining fields minus their opening brace
+        yield b"]," + orjson.dumps(tail, option=orjson.OPT_SERIALIZE_NUMPY)[1:]
+
+    return StreamingResponse(body(), media_type="application/json")
 
 @app.post("/v1/embeddings")
 async def create_embeddings(request: EmbeddingRequest):
@@ -135,52 +587,76 @@ async def create_embeddings(request: EmbeddingRequest):
         if request.prefix:
             texts = [f"{request.prefix}: {text}" for text in texts]
 
-        # Calculate tokens roughly for usage stats (approximation)
-        prompt_tokens = sum(len(text.split()) for text in texts) # Very rough approx
+        # Calculate tokens roughly for usage stats (~4 characters per token, no per-text split)
+        prompt_tokens = sum(len(text) for text in texts) // 4
 
-        # Generate embeddings in float32
-        embeddings = model.encode(
-            texts,
-            batch_size=batch_size,
-            convert_to_numpy=True,
-            show_progress_bar=False
-        )
+        # Generate embeddings in float32, batched with any concurrent requests
+        embeddings = await encode_cached(texts)
 
-        # Apply manual int8 quantization if enabled
-        # Simple linear quantization: scale float range to int8 range [-128, 127]
-        if use_quantization:
-            # Find global min/max for quantization range
-            min_val = embeddings.min()
-            max_val = embeddings.max()
-
-            # Scale to int8 range [-128, 127]
-            # Formula: int8_value = (float_value - min) / (max - min) * 255 - 128
-            if max_val > min_val:  # Avoid division by zero
-                embeddings = ((embeddings - min_val) / (max_val - min_val) * 255 - 128).astype(np.int8)
-                logger.debug(f"Quantized to int8: min={min_val:.4f}, max={max_val:.4f}")
-            else:
-                logger.warning("Cannot quantize: min == max, keeping float32")
+        if request.encoding_format == "base64":
+            # OpenAI-standard base64: little-endian float32 bytes, which SDK clients decode as such
+            # (so server-side int8 quantization never applies here)
+            data = [
+                {"object": "embedding", "index": i, "embedding": _b64(row)}
+                for i, row in enumerate(embeddings.astype("<f4", copy=False))
+            ]
+        elif request.encoding_format == "float16":
+            # Half-precision rows as base64 little-endian bytes: half the size of fp32 on the wire
+            data = [
+                {"object": "embedding", "index": i, "embedding": _b64(row)}
+                for i, row in enumerate(embeddings.astype("<f2"))
+            ]
+        elif request.encoding_format == "int8":
+            # Symmetric per-vector int8 as base64 bytes; clients recover embedding ≈ codes * scale
+            scale = np.abs(embeddings).max(axis=1, keepdims=True) / 127
+            scale[scale == 0] = 1.0
+            codes = np.round(embeddings / scale).astype(np.int8)
+            data = [
+                {"object": "embedding", "index": i, "embedding": _b64(row), "scale": float(row_scale)}
+                for i, (row, row_scale) in enumerate(zip(codes, scale[:, 0]))
+            ]
+        elif request.encoding_format == "int8_float16":
+            # Both views for two-stage retrieval: int8 codes for ANN top-k, fp16 for rescoring
+            codes = quantize_per_dim(embeddings)
+            data = [
+                {"object": "embedding", "index": i, "embedding_i8": _b64(row_i8), "embedding_f16": _b64(row_f16)}
+                for i, (row_i8, row_f16) in enumerate(zip(codes, embeddings.astype("<f2")))
+            ]
         else:
-            # Keep as float32
-            embeddings = embeddings.astype(np.float32)
+            # Apply manual int8 quantization if enabled (fixed ranges, so batching never changes the scale)
+            if use_quantization:
+                codes = quantize_per_dim(embeddings)
+                # One base64 string per row instead of D JSON integers
+                data = [
+                    {"object": "embedding", "index": i, "embedding": _b64(row),
+                     "encoding_format": "base64", "dtype": "int8"}
+                    for i, row in enumerate(codes)
+                ]
+            else:
+                # Keep as float32 (a no-op view, since encode() already returns float32);
+                # orjson serializes the numpy rows natively
+                embeddings = embeddings.astype(np.float32, copy=False)
+                data = [
+                    {"object": "embedding", "index": i, "embedding": embedding}
+                    for i, embedding in enumerate(embeddings)
+                ]
 
-        # Format response to match OpenAI API
-        data = []
-        for i, embedding in enumerate(embeddings):
-            data.append({
-                "object": "embedding",
-                "index": i,
-                "embedding": embedding.tolist()
-            })
-        
-        return EmbeddingResponse(
-            data=data,
-            model=model_name,
-            usage={
+        tail = {
+            "model": model_name,
+            "usage": {
                 "prompt_tokens": prompt_tokens,
                 "total_tokens": prompt_tokens
             }
-        )
+        }
+        if len(data) >= stream_threshold:
+            return stream_embedding_response(data, tail)
+
+        # Format response to match OpenAI API
+        return ORJSONResponse({
+            "object": "list",
+            "data": data,
+            **tail
+        })
         
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
@@ -200,6 +676,14 @@ async def health_check():
         "dimensions": model.get_sentence_embedding_dimension() if model else None
     }
 
+@app.get("/v1/quantization")
+async def quantization_ranges():
+    """Per-dimension ranges and saturation power for decoding int8 / int8_float16 codes."""
+    if quant_min is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    # Returned directly so orjson serializes the numpy arrays without jsonable_encoder
+    return ORJSONResponse({"min": quant_min, "scale": quant_scale, "power": quant_power})
+
 @app.get("/v1/models")
 async def list_models():
     return {
@@ -213,9 +697,37 @@ async def list_models():
         }]
     }
 
+# macOS QoS class that keeps a thread on the performance cores (<sys/qos.h>)
+QOS_CLASS_USER_INTERACTIVE = 0x21
+
+
+def prefer_performance_cores():
+    """Raise this thread's QoS on macOS so the scheduler keeps it (and threads it spawns) on P-cores."""
+    if sys.platform != "darwin":
+        return
+    try:
+        libsystem = ctypes.CDLL("/usr/lib/libSystem.dylib")
+        if libsystem.pthread_set_qos_class_self_np(QOS_CLASS_USER_INTERACTIVE, 0) == 0:
+            logger.info("Thread QoS set to user-interactive (performance cores)")
+    except Exception as e:
+        logger.warning(f"Could not set thread QoS: {e}")
+
+
 if __name__ == "__main__":
     if not model_name:
         logger.error("Embedding model name not configured. Exiting.")
     else:
-        # Disable uvloop for OpenAI SDK compatibility
-        uvicorn.run(app, host=host, port=port, loop="asyncio")
+        prefer_performance_cores()
+        # uvloop/httptools cut per-request loop and parsing overhead; the access log is off
+        # because it adds a logging call per request (the auth proxy in front still logs).
+        # Long keep-alive lets the proxy's pooled connections stay open between requests
+        uvicorn.run(
+            app,
+            host=host,
+            port=port,
+            loop="uvloop",
+            http="httptools",
+            access_log=False,
+            backlog=2048,
+            timeout_keep_alive=60,
+        )
@@ -14,18 +14,21 @@ mlx-openai-server for multimodal OCR (previous image text bleeding into the
 next response). This implementation avoids retaining any per-request state.
 """
 
+import asyncio
 import base64
+import io
 import logging
-import re
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import tomlkit
+import tomllib
 import uvicorn
 
 
@@ -33,8 +36,8 @@ def load_config():
     """Load settings from the TOML config file."""
     try:
         config_path = Path(__file__).parent.parent / "config" / "settings.toml"
-        with open(config_path, "r") as f:
-            return tomlkit.load(f)
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
     except FileNotFoundError:
         print("❌ Configuration file 'config/settings.toml' not found.", file=sys.stderr)
         print(
@@ -64,13 +67,36 @@ DEFAULT_TEMPERATURE = float(ocr_config.get("temperature", 0.0))
 
 _model = None
 _processor = None
+_model_config: Any = {}
+# Whether this mlx-vlm accepts PIL images directly (older releases only take file paths)
+_in_memory_images = False
 
 
 def _parse_data_url_image(data_url: str) -> bytes:
-    m = re.match(r"^data:image/[^;]+;base64,(.*)$", data_url, flags=re.DOTALL)
-    if not m:
+    # Only the short header is inspected; the payload goes straight to the decoder
+    idx = data_url.find(",", 0, 256)
+    head = data_url[:idx] if idx != -1 else ""
+    if not head.startswith("data:image/") or not head.endswith(";base64") or head.count(";") != 1:
         raise ValueError("Only data:image/*;base64,... URLs are supported")
-    return base64.b64decode(m.group(1))
+    return base64.b64decode(data_url[idx + 1:])
+
+
+@lru_cache(maxsize=1024)
+def _templated_prompt(prompt: str) -> str:
+    """Chat-templated prompt with one image placeholder; OCR prompts repeat, so cache them."""
+    import mlx_vlm
+
+    # Try to apply a chat template that includes image placeholders.
+    try:
+        return mlx_vlm.apply_chat_template(
+            _processor,
+            _model_config,
+            [{"role": "user", "content": prompt}],
+            add_generation_prompt=True,
+            num_images=1,
+        )
+    except Exception:
+        return prompt
 
 
 def _extract_prompt_and_image(messages: List[Dict[str, Any]]) -> tuple[str, bytes]:
@@ -112,9 +138,59 @@ def _extract_prompt_and_image(messages: List[Dict[str, Any]]) -> tuple[str, byte
     return prompt, image_bytes
 
 
+def _supports_in_memory_images() -> bool:
+    try:
+        from PIL import Image
+        from mlx_vlm.utils import load_image
+
+        load_image(Image.new("RGB", (1, 1)))
+        return True
+    except Exception:
+        return False
+
+
+def _generate_text(prompt_str: str, image: Any, temperature: float, max_tokens: int) -> str:
+    import mlx_vlm
+
+    result = mlx_vlm.generate(
+        _model,
+        _processor,
+        prompt_str,
+        image=image,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        verbose=False,
+    )
+    return getattr(result, "text", None) or getattr(result, "output_text", None) or str(result)
+
+
+def _run_ocr(prompt: str, image_bytes: bytes, temperature: float, max_tokens: int) -> str:
+    prompt_str = _templated_prompt(prompt)
+
+    if _in_memory_images:
+        from PIL import Image
+
+        return _generate_text(prompt_str, Image.open(io.BytesIO(image_bytes)), temperature, max_tokens)
+
+    # Legacy mlx-vlm: hand it a file path
+    with tempfile.NamedTemporaryFile(delete=True, suffix=".png") as f:
+        f.write(image_bytes)
+        f.flush()
+        return _generate_text(prompt_str, f.name, temperature, max_tokens)
+
+
+def _warmup() -> None:
+    """Run one tiny generation so the first real request skips lazy kernel compilation."""
+    from PIL import Image
+
+    png = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(png, format="PNG")
+    _run_ocr("Extract all visible text from this image.", png.getvalue(), 0.0, 1)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _model, _processor
+    global _model, _processor, _model_config, _in_memory_images
 
     if not MODEL_ID:
         logger.error("❌ OCR model not configured under [services.ocr] in settings.toml")
@@ -131,12 +207,23 @@ async def lifespan(app: FastAPI):
     logger.info(f"Loading OCR VLM: {MODEL_ID}")
     try:
         _model, _processor = mlx_vlm.load(MODEL_ID)
+        _model_config = getattr(_model, "config", {})
+        _in_memory_images = _supports_in_memory_images()
         logger.info("✅ OCR model loaded")
+        try:
+            _warmup()
+        except Exception as e:
+            logger.warning(f"OCR warmup failed (first request may be slow): {e}")
     except Exception as e:
         logger.exception(f"❌ Failed to load OCR model: {e}")
         _model, _processor = None, None
 
+    # One generation at a time, on a dedicated thread, so the event loop keeps serving /health
+    app.state.gen_sem = asyncio.Semaphore(1)
+    app.state.gen_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-generate")
+
     yield
+    app.state.gen_pool.shutdown(wait=False, cancel_futures=True)
     logger.info("Shutting down OCR server")
 
 
@@ -178,39 +265,14 @@ async def chat_completions(req: ChatCompletionRequest):
     max_tokens = int(req.max_tokens) if req.max_tokens is not None else DEFAULT_MAX_TOKENS
     temperature = float(req.temperature) if req.temperature is not None else DEFAULT_TEMPERATURE
 
-    with tempfile.NamedTemporaryFile(delete=True, suffix=".png") as f:
-        f.write(image_bytes)
-        f.flush()
-
-        try:
-            import mlx_vlm
-
-            # Try to apply a chat template that includes image placeholders.
-            try:
-                prompt_str = mlx_vlm.apply_chat_template(
-                    _processor,
-                    getattr(_model, "config", {}),
-                    [{"role": "user", "content": prompt}],
-                    add_generation_prompt=True,
-                    num_images=1,
-                )
-            except Exception:
-                prompt_str = prompt
-
-            result = mlx_vlm.generate(
-                _model,
-                _processor,
-                prompt_str,
-                image=f.name,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                verbose=False,
+    try:
+        async with app.state.gen_sem:
+            content = await asyncio.get_running_loop().run_in_executor(
+                app.state.gen_pool, _run_ocr, prompt, image_bytes, temperature, max_tokens
             )
-
-            content = getattr(result, "text", None) or getattr(result, "output_text", None) or str(result)
-        except Exception as e:
-            logger.exception(f"OCR generation failed: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.exception(f"OCR generation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
     return {
         "id": "chatcmpl-olmocr",
@@ -231,8 +293,9 @@ def main():
     if not MODEL_ID:
         logger.error("OCR model name not configured. Exiting.")
         raise SystemExit(1)
-    # Disable uvloop for OpenAI SDK compatibility
-    uvicorn.run(app, host=HOST, port=PORT, loop="asyncio")
+    # uvloop, httptools and a long keep-alive trim per-request overhead for the
+    # auth proxy's pooled connections
+    uvicorn.run(app, host=HOST, port=PORT, loop="uvloop", http="httptools", backlog=2048, timeout_keep_alive=60)
 
 
 if __name__ == "__main__":
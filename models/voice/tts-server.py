@@ -10,15 +10,17 @@ Endpoint:
 import io
 import logging
 import os
+import struct
 import sys
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-import tomlkit
+import numpy as np
+import tomllib
 import uvicorn
 
 
@@ -72,8 +74,8 @@ def load_config():
     os.environ.setdefault("NUMBA_CACHE_DIR", str(Path.home() / "Library" / "Caches" / "numba"))
     try:
         config_path = resolve_config_path()
-        with open(config_path, "r") as f:
-            return tomlkit.load(f)
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
     except FileNotFoundError:
         print("❌ Configuration file 'config/settings.toml' not found.", file=sys.stderr)
         print("   Please copy 'config/settings.toml.example' to 'config/settings.toml' and customize it.", file=sys.stderr)
@@ -99,6 +101,18 @@ ATTN_IMPL = tts_config.get("attn_implementation")
 
 _model = None
 
+WAV_CHUNK_BYTES = 64 * 1024
+
+# response_format -> (soundfile container, subtype, media type); wav and pcm are streamed raw.
+# Anything else (e.g. aac) is answered with wav, as before formats were honored
+COMPRESSED_FORMATS = {
+    "opus": ("OGG", "OPUS", "audio/ogg"),
+    "flac": ("FLAC", "PCM_16", "audio/flac"),
+    # Needs libsndfile >= 1.1; older builds fall back to wav
+    "mp3": ("MP3", "MPEG_LAYER_III", "audio/mpeg"),
+}
+SUPPORTED_FORMATS = {"wav", "pcm", *COMPRESSED_FORMATS}
+
 
 def resolve_tts_model_id(model_id: Optional[str]) -> Optional[str]:
     if not model_id:
@@ -122,6 +136,50 @@ def _select_device():
     return "cpu", torch.float32
 
 
+def wav_header(num_frames: int, sr: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """Canonical 44-byte PCM WAV header for a known number of frames."""
+    block_align = channels * sample_width
+    data_size = num_frames * block_align
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sr, sr * block_align, block_align, sample_width * 8,
+        b"data", data_size,
+    )
+
+
+def to_pcm16(samples: np.ndarray) -> np.ndarray:
+    """Clip float samples to [-1, 1] and convert to little-endian int16."""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def stream_pcm(pcm: np.ndarray, media_type: str, header: bytes = b"") -> StreamingResponse:
+    """Stream an optional header plus int16 samples in fixed-size chunks, without a full in-memory file."""
+    body = memoryview(pcm).cast("B")
+
+    def chunks():
+        if header:
+            yield header
+        for start in range(0, len(body), WAV_CHUNK_BYTES):
+            yield bytes(body[start:start + WAV_CHUNK_BYTES])
+
+    return StreamingResponse(
+        chunks(),
+        media_type=media_type,
+        headers={"Content-Length": str(len(header) + len(body))},
+    )
+
+
+def encode_audio(pcm: np.ndarray, sr: int, response_format: str) -> Response:
+    """Encode int16 samples into a compressed container with soundfile."""
+    import soundfile as sf
+
+    container, subtype, media_type = COMPRESSED_FORMATS[response_format]
+    buffer = io.BytesIO()
+    sf.write(buffer, pcm, sr, format=container, subtype=subtype)
+    return Response(content=buffer.getvalue(), media_type=media_type)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global _model
@@ -163,6 +221,11 @@ async def lifespan(app: FastAPI):
             **model_kwargs,
         )
         logger.info("✅ TTS model loaded")
+        try:
+            # One short utterance so the first request skips lazy kernel compilation
+            _model.generate_custom_voice(text="Hi.", language=DEFAULT_LANGUAGE, speaker=DEFAULT_VOICE, instruct="")
+        except Exception as e:
+            logger.warning(f"TTS warmup failed (first request may be slow): {e}")
     except Exception as e:
         logger.exception(f"❌ Failed to load TTS model: {e}")
         _model = None
@@ -204,15 +267,15 @@ async def text_to_speech(req: SpeechRequest):
     if not text:
         raise HTTPException(status_code=400, detail="input must not be empty")
 
+    response_format = (req.response_format or "wav").lower()
+    if response_format not in SUPPORTED_FORMATS:
+        logger.warning(f"response_format {response_format!r} is not supported; returning wav")
+        response_format = "wav"
+
     voice = req.voice or DEFAULT_VOICE
     language = req.language or DEFAULT_LANGUAGE
     instruct = req.instruct or ""
 
-    try:
-        import soundfile as sf
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"soundfile dependency missing: {e}")
-
     mode = (req.mode or "custom_voice").lower()
     try:
         if mode == "voice_design":
@@ -226,11 +289,16 @@ async def text_to_speech(req: SpeechRequest):
     if not wavs:
         raise HTTPException(status_code=500, detail="TTS generation returned empty audio")
 
-    buffer = io.BytesIO()
-    sf.write(buffer, wavs[0], sr, format="WAV")
-    buffer.seek(0)
-
-    return Response(content=buffer.getvalue(), media_type="audio/wav")
+    pcm = to_pcm16(np.asarray(wavs[0]))
+    if response_format == "pcm":
+        return stream_pcm(pcm, "audio/pcm")
+    if response_format != "wav":
+        try:
+            return encode_audio(pcm, sr, response_format)
+        except Exception as e:
+            logger.warning(f"Encoding {response_format} failed, returning wav: {e}")
+    channels = 1 if pcm.ndim == 1 else pcm.shape[1]
+    return stream_pcm(pcm, "audio/wav", wav_header(len(pcm), sr, channels))
 
 
 @app.get("/health")
@@ -7,68 +7,102 @@ Endpoint:
 - GET  /v1/models
 """
 
+import asyncio
+import dataclasses
 import inspect
 import logging
 import os
+import re
+import subprocess
 import sys
 import tempfile
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 import shutil
 
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
-import tomlkit
+from fastapi.responses import ORJSONResponse
+import numpy as np
+import tomllib
 import uvicorn
 
+try:
+    import mlx_whisper
+    from huggingface_hub import snapshot_download
+except Exception as e:  # Reported per request so /health and /v1/models still work
+    mlx_whisper = None
+    snapshot_download = None
+    MLX_WHISPER_IMPORT_ERROR = e
+
+
+def _transcribe_kwarg_names() -> frozenset:
+    """transcribe()'s named parameters, plus DecodingOptions fields it forwards via **decode_options."""
+    if mlx_whisper is None:
+        return frozenset()
+    params = inspect.signature(mlx_whisper.transcribe).parameters
+    names = {name for name, p in params.items() if p.kind is not inspect.Parameter.VAR_KEYWORD}
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        from mlx_whisper.decoding import DecodingOptions
+
+        names.update(f.name for f in dataclasses.fields(DecodingOptions))
+    return frozenset(names)
+
+
+# Looked up once rather than per request
+_ALLOWED_TRANSCRIBE_KWARGS = _transcribe_kwarg_names()
+
+
+# KEY=value, KEY="value" or KEY='value' per line; unquoted values stop at a # comment
+_ENV_RE = re.compile(r"""^[ \t]*([A-Za-z_][A-Za-z_0-9]*)[ \t]*=[ \t]*(?:"([^"]*)"|'([^']*)'|([^#\r\n]*))""", re.M)
+
 
 def load_env_file():
     env_path = Path(__file__).resolve().parents[2] / "config" / "settings.env"
     if not env_path.exists():
         return
     try:
-        for line in env_path.read_text().splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            key, value = line.split("=", 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            if key and key not in os.environ:
-                os.environ[key] = value
+        for m in _ENV_RE.finditer(env_path.read_text()):
+            key, double, single, bare = m.groups()
+            value = double if double is not None else single if single is not None else bare.strip()
+            os.environ.setdefault(key, value)
     except Exception as e:
         print(f"⚠️  Failed to read settings.env: {e}", file=sys.stderr)
 
 
+@lru_cache(maxsize=None)
 def resolve_config_path() -> Path:
+    """First existing settings.toml, by env override, then script and cwd ancestors (memoized)."""
     candidates = []
 
     env_path = os.environ.get("MLX_BOX_CONFIG")
     if env_path:
         candidate = Path(env_path).expanduser()
         candidates.append(candidate)
-        if candidate.exists():
+        if os.path.isfile(candidate):
             return candidate
 
     env_root = os.environ.get("MLX_BOX_ROOT")
     if env_root:
         candidate = Path(env_root).expanduser() / "config" / "settings.toml"
         candidates.append(candidate)
-        if candidate.exists():
+        if os.path.isfile(candidate):
             return candidate
 
-    script_path = Path(__file__).resolve()
-    for parent in [script_path.parent, *script_path.parents]:
+    # parents already starts at the script's own directory
+    for parent in Path(__file__).resolve().parents:
         candidate = parent / "config" / "settings.toml"
         candidates.append(candidate)
-        if candidate.exists():
+        if os.path.isfile(candidate):
             return candidate
 
     cwd = Path.cwd().resolve()
     for parent in [cwd, *cwd.parents]:
         candidate = parent / "config" / "settings.toml"
         candidates.append(candidate)
-        if candidate.exists():
+        if os.path.isfile(candidate):
             return candidate
 
     attempted = "\n".join(f"   - {c}" for c in candidates)
@@ -81,8 +115,7 @@ def load_config():
     try:
         config_path = resolve_config_path()
         logger.info(f"✅ Using config: {config_path}")
-        with open(config_path, "r") as f:
-            return tomlkit.load(f)
+        return tomllib.loads(config_path.read_text())
     except FileNotFoundError:
         print("❌ Configuration file 'config/settings.toml' not found.", file=sys.stderr)
         print(f"   MLX_BOX_CONFIG={os.environ.get('MLX_BOX_CONFIG')}", file=sys.stderr)
@@ -106,6 +139,32 @@ HOST = server_config.get("host", "127.0.0.1")
 PORT = int(whisper_config.get("backend_port") or whisper_config.get("port", 8087))
 MODEL_ID = whisper_config.get("model")
 DEFAULT_LANGUAGE = whisper_config.get("language")
+# Weight variant for short model names: fp16 skips per-layer dequantization (lowest
+# latency), 4bit/8bit trade some speed for memory
+PRECISION_SUFFIXES = {"fp16": "-mlx", "8bit": "-8bit", "4bit": "-4bit"}
+PRECISION = whisper_config.get("precision", "4bit")
+if PRECISION not in PRECISION_SUFFIXES:
+    logger.warning(f"Unknown Whisper precision {PRECISION!r}; using 4bit")
+    PRECISION = "4bit"
+# Optional voice-activity prefilter (needs `pip install webrtcvad`): silence is cut
+# before decoding and timestamps are mapped back to the original audio
+VAD_ENABLED = bool(whisper_config.get("vad", False))
+VAD_AGGRESSIVENESS = int(whisper_config.get("vad_aggressiveness", 2))
+VAD_FRAME_MS = 30
+VAD_PAD_MS = 300
+MAX_CONCURRENT = int(whisper_config.get("max_concurrent_transcriptions", 1))
+# Dynamic batching of short clips (1 disables): requests arriving within the window
+# share one batched encoder/decoder pass
+BATCH_SIZE = int(whisper_config.get("batch_size", 1))
+BATCH_TIMEOUT = whisper_config.get("batch_timeout_ms", 20) / 1000
+
+
+# Short names with a fixed repo. Turbo only ships in full precision; everything else
+# follows [services.whisper].precision
+_MODEL_ID_MAP = {
+    "turbo": "mlx-community/whisper-large-v3-turbo",
+    "large-v3-turbo": "mlx-community/whisper-large-v3-turbo",
+}
 
 
 def resolve_model_id(model_id: str) -> str:
@@ -119,14 +178,7 @@ def resolve_model_id(model_id: str) -> str:
     model_id = model_id.strip()
     if "/" in model_id:
         return model_id
-
-    mapping = {
-        "small.en": "mlx-community/whisper-small.en-4bit",
-        "medium.en": "mlx-community/whisper-medium.en-4bit",
-        "turbo": "mlx-community/whisper-large-v3-turbo",
-        "large-v3-turbo": "mlx-community/whisper-large-v3-turbo",
-    }
-    return mapping.get(model_id, f"mlx-community/whisper-{model_id}-4bit")
+    return _MODEL_ID_MAP.get(model_id, f"mlx-community/whisper-{model_id}{PRECISION_SUFFIXES[PRECISION]}")
 
 
 def prepare_whisper_model_path(model_id: str) -> str:
@@ -138,12 +190,12 @@ def prepare_whisper_model_path(model_id: str) -> str:
     if model_path.exists():
         return str(model_path)
 
-    try:
-        from huggingface_hub import snapshot_download
-    except Exception:
+    if snapshot_download is None:
         return model_id
 
-    model_path = Path(snapshot_download(repo_id=model_id))
+    # mlx_whisper only reads config.json and the weights (tokenizer and mel filters ship
+    # with the package), so skip READMEs, original checkpoints and the like
+    model_path = Path(snapshot_download(repo_id=model_id, allow_patterns=["*.json", "*.safetensors", "*.npz"]))
 
     # mlx_whisper expects weights.safetensors or weights.npz.
     # Some repos provide model.safetensors; link/copy it into place.
@@ -152,25 +204,277 @@ def prepare_whisper_model_path(model_id: str) -> str:
     if model_safetensors.exists() and not weights_safetensors.exists():
         try:
             weights_safetensors.symlink_to(model_safetensors.name)
-        except Exception:
+            logger.debug(f"Symlinked {weights_safetensors}")
+        except OSError:
+            # Hub snapshot files are themselves symlinks into blobs/; link the real file
             try:
-                shutil.copyfile(model_safetensors, weights_safetensors)
-            except Exception:
-                pass
+                os.link(model_safetensors.resolve(), weights_safetensors)
+                logger.debug(f"Hardlinked {weights_safetensors}")
+            except OSError:
+                try:
+                    shutil.copyfile(model_safetensors, weights_safetensors)
+                    logger.debug(f"Copied {weights_safetensors}")
+                except OSError:
+                    pass
 
     return str(model_path)
 
 
+# Resolved repo id -> local model directory, so snapshot_download runs once per model
+_model_path_cache: dict[str, str] = {}
+
+
+def cached_model_path(model_id: str) -> str:
+    """prepare_whisper_model_path, memoized for the life of the process."""
+    path = _model_path_cache.get(model_id)
+    if path is None:
+        path = _model_path_cache[model_id] = prepare_whisper_model_path(model_id)
+    return path
+
+
+# MP4-family containers usually keep their index (moov) at the end, which ffmpeg cannot
+# reach through a pipe; these go straight to the seekable-file path
+SEEKABLE_ONLY_SUFFIXES = {".m4a", ".m4b", ".mp4", ".m4v", ".mov", ".3gp"}
+
+
+def _feed_stdin(proc: subprocess.Popen, upload) -> None:
+    """Copy the upload into ffmpeg's stdin in 1 MB chunks, stopping quietly if ffmpeg exits early."""
+    try:
+        shutil.copyfileobj(upload, proc.stdin, 1 << 20)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+
+
+def decode_upload(upload) -> Optional[np.ndarray]:
+    """Decode an upload to 16 kHz mono float32 by piping it through ffmpeg, without a temp file.
+
+    The upload is streamed to ffmpeg rather than read into memory: a spooled upload that has
+    already rolled to disk is passed as ffmpeg's stdin directly, a small in-memory one is fed
+    from a writer thread. Returns None when ffmpeg cannot decode it from a pipe, so the caller
+    can fall back to writing a seekable file.
+    """
+    cmd = [
+        "ffmpeg", "-threads", "0", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", "16000", "-",
+    ]
+    upload.seek(0)
+    try:
+        # fileno() on an in-memory SpooledTemporaryFile would force it to disk, so check first
+        if getattr(upload, "_rolled", False):
+            proc = subprocess.run(cmd, stdin=upload.fileno(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            returncode, pcm = proc.returncode, proc.stdout
+        else:
+            with subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            ) as proc:
+                writer = threading.Thread(target=_feed_stdin, args=(proc, upload), daemon=True)
+                writer.start()
+                pcm = proc.stdout.read()
+                returncode = proc.wait()
+                writer.join()
+    except OSError:
+        return None
+    if returncode != 0 or not pcm:
+        return None
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+@contextmanager
+def upload_tempfile(suffix: str):
+    """A seekable file with a path ffmpeg can open: an in-RAM memfd on Linux, a named temp file elsewhere."""
+    if sys.platform == "linux" and hasattr(os, "memfd_create"):
+        fd = os.memfd_create("whisper-upload")
+        with os.fdopen(fd, "w+b") as f:
+            # /proc/self would be ffmpeg's own fd table; name this process explicitly
+            yield f, f"/proc/{os.getpid()}/fd/{fd}"
+        return
+
+    with tempfile.NamedTemporaryFile(delete=True, suffix=suffix) as f:
+        yield f, f.name
+
+
+def trim_silence(vad, audio) -> tuple[np.ndarray, list[tuple[int, int]]]:
+    """Keep only voiced regions (padded by VAD_PAD_MS); returns the speech and its sample ranges."""
+    from mlx_whisper.audio import SAMPLE_RATE, load_audio
+
+    if isinstance(audio, str):
+        audio = np.asarray(load_audio(audio))
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    pad = VAD_PAD_MS // VAD_FRAME_MS
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    n_frames = len(pcm) // frame
+
+    regions: list[tuple[int, int]] = []
+    for i in range(n_frames):
+        if not vad.is_speech(pcm[i * frame:(i + 1) * frame].tobytes(), SAMPLE_RATE):
+            continue
+        start = max(0, i - pad) * frame
+        end = min(len(pcm), (i + 1 + pad) * frame)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+
+    if not regions:
+        return audio[:0], regions
+    return np.concatenate([audio[start:end] for start, end in regions]), regions
+
+
+def restore_timestamps(result: dict, regions: list[tuple[int, int]]) -> None:
+    """Map segment and word times from the trimmed audio back onto the original timeline."""
+    from mlx_whisper.audio import SAMPLE_RATE
+
+    def original(t: float) -> float:
+        pos = t * SAMPLE_RATE
+        kept = 0
+        for start, end in regions:
+            if pos <= kept + (end - start):
+                return (start + pos - kept) / SAMPLE_RATE
+            kept += end - start
+        return regions[-1][1] / SAMPLE_RATE
+
+    for segment in result.get("segments", []):
+        for item in (segment, *segment.get("words", [])):
+            if "start" in item:
+                item["start"] = original(item["start"])
+            if "end" in item:
+                item["end"] = original(item["end"])
+
+
 def build_transcribe_kwargs(**kwargs):
     """Filter kwargs to match mlx_whisper.transcribe signature."""
-    import mlx_whisper
+    return {k: v for k, v in kwargs.items() if k in _ALLOWED_TRANSCRIBE_KWARGS and v is not None}
+
+
+def get_whisper_model(model_path: str):
+    """The model transcribe() would use for model_path (cached in ModelHolder)."""
+    import mlx.core as mx
+    from mlx_whisper.transcribe import ModelHolder
+
+    return ModelHolder.get_model(model_path, mx.float16)
+
+
+def prepare_batch_mel(audio, n_mels: int):
+    """Log-mel features padded to one 30s window, or None if the clip is longer."""
+    from mlx_whisper.audio import N_FRAMES, N_SAMPLES, load_audio, log_mel_spectrogram, pad_or_trim
+
+    if isinstance(audio, str):
+        audio = load_audio(audio)
+    if audio.shape[0] > N_SAMPLES:
+        return None
+    return pad_or_trim(log_mel_spectrogram(audio, n_mels=n_mels, padding=N_SAMPLES), N_FRAMES, axis=-2)
+
+
+def decode_batch(model_path: str, mels: list, options):
+    """One batched decoder pass over stacked 30s mel windows."""
+    import mlx.core as mx
+    from mlx_whisper.decoding import decode
+
+    return decode(get_whisper_model(model_path), mx.stack(mels).astype(mx.float16), options)
+
 
-    sig = inspect.signature(mlx_whisper.transcribe)
-    allowed = set(sig.parameters.keys())
-    return {k: v for k, v in kwargs.items() if k in allowed and v is not None}
+async def batcher_loop(app: FastAPI):
+    """Coalesce queued short clips and decode each group of identical options in one pass."""
+    queue = app.state.batch_queue
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await queue.get()]
+        deadline = loop.time() + BATCH_TIMEOUT
+        while len(items) < BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # decode() applies one DecodingOptions to the whole batch
+        groups = {}
+        for mel, future, options in items:
+            groups.setdefault(options, []).append((mel, future))
+
+        for options, group in groups.items():
+            try:
+                async with app.state.transcribe_sem:
+                    results = await asyncio.to_thread(
+                        decode_batch, app.state.model_path, [mel for mel, _ in group], options
+                    )
+            except Exception as e:
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), res in zip(group, results):
+                if not future.done():
+                    future.set_result({"text": res.text.strip()})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # MLX work runs on worker threads; this bounds how many touch the model at once
+    # (default 1: MLX is not safe for concurrent transcriptions on one model)
+    app.state.transcribe_sem = asyncio.Semaphore(MAX_CONCURRENT)
+    app.state.model_path = None
+    app.state.n_mels = None
+    app.state.batch_queue = None
+    batcher = None
+
+    if MODEL_ID:
+        try:
+            # transcribe() keeps its last model in ModelHolder; load it now so the
+            # first request doesn't pay for the download and weight load
+            model_path = cached_model_path(resolve_model_id(MODEL_ID))
+            logger.info(f"Loading Whisper model: {model_path}")
+            whisper_model = get_whisper_model(model_path)
+            app.state.model_path = model_path
+            # Read once here so batched requests never touch ModelHolder on the event loop
+            app.state.n_mels = whisper_model.dims.n_mels
+            logger.info("✅ Whisper model loaded")
+
+            # mel_filters and get_tokenizer are lru_cached inside mlx_whisper; fill those
+            # caches now (same arguments transcribe() uses) so no request parses the .npz
+            # filter bank or the tiktoken vocabulary
+            from mlx_whisper.audio import mel_filters
+            from mlx_whisper.tokenizer import get_tokenizer
+
+            mel_filters(whisper_model.dims.n_mels)
+            get_tokenizer(
+                whisper_model.is_multilingual,
+                num_languages=whisper_model.num_languages,
+                language=DEFAULT_LANGUAGE if whisper_model.is_multilingual else "en",
+                task="transcribe",
+            )
+        except Exception as e:
+            logger.warning(f"Whisper preload failed (first request will load the model): {e}")
+
+    app.state.vad = None
+    if VAD_ENABLED:
+        try:
+            import webrtcvad
+
+            app.state.vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+            logger.info(f"VAD prefilter enabled (aggressiveness {VAD_AGGRESSIVENESS})")
+        except Exception as e:
+            logger.warning(f"VAD requested but unavailable, transcribing full audio: {e}")
 
+    if BATCH_SIZE > 1 and app.state.model_path:
+        app.state.batch_queue = asyncio.Queue()
+        batcher = asyncio.create_task(batcher_loop(app))
+        logger.info(f"Batching text-format clips <= 30s: up to {BATCH_SIZE} per pass, {BATCH_TIMEOUT * 1000:.0f} ms window")
 
-app = FastAPI(title="MLX Whisper STT", version="1.0.0")
+    yield
+    if batcher:
+        batcher.cancel()
+    logger.info("Shutting down Whisper server")
+
+
+app = FastAPI(title="MLX Whisper STT", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 @app.get("/v1/models")
@@ -183,6 +487,85 @@ async def list_models():
     }
 
 
+async def transcribe_batched(audio, model_path, language, task, temperature, prompt) -> Optional[dict]:
+    """Queue a clip for the batcher; None if it is longer than one 30s window."""
+    from mlx_whisper.decoding import DecodingOptions
+
+    async with app.state.transcribe_sem:
+        mel = await asyncio.to_thread(prepare_batch_mel, audio, app.state.n_mels)
+    if mel is None:
+        return None
+
+    # A single temperature and no timestamp tokens: batched decode has no per-item fallback
+    options = DecodingOptions(
+        task=task or "transcribe",
+        language=language,
+        temperature=temperature or 0.0,
+        prompt=prompt,
+        without_timestamps=True,
+    )
+    future = asyncio.get_running_loop().create_future()
+    await app.state.batch_queue.put((mel, future, options))
+    try:
+        return await future
+    except Exception as e:
+        logger.exception("Batched Whisper transcription failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def run_transcription(audio, model_path, language, prompt, response_format, temperature, task, word_timestamps):
+    """Transcribe a file path or decoded sample array and shape the OpenAI-style response."""
+    regions = None
+    if app.state.vad is not None:
+        audio, regions = await asyncio.to_thread(trim_silence, app.state.vad, audio)
+        if audio.size == 0:
+            if response_format in ("verbose_json", "json"):
+                return ORJSONResponse({"text": "", "segments": [], "language": language})
+            return {"text": ""}
+
+    # Short plain-text clips can join a batched pass instead; batched decode yields no
+    # segments, so json keeps the unbatched path and its usual shape
+    if (
+        app.state.batch_queue is not None
+        and model_path == app.state.model_path
+        and not word_timestamps
+        and response_format == "text"
+    ):
+        result = await transcribe_batched(audio, model_path, language, task, temperature, prompt)
+        if result is not None:
+            return {"text": result["text"]}
+
+    kwargs = build_transcribe_kwargs(
+        path_or_hf_repo=model_path,
+        language=language,
+        task=task,
+        temperature=temperature,
+        initial_prompt=prompt,
+        word_timestamps=word_timestamps,
+        # Plain-text callers never see segment times, so skip decoding timestamp tokens
+        without_timestamps=True if response_format == "text" and not word_timestamps else None,
+    )
+
+    try:
+        # Off the event loop, so uploads and other requests proceed during decoding
+        async with app.state.transcribe_sem:
+            result = await asyncio.to_thread(mlx_whisper.transcribe, audio, **kwargs)
+    except Exception as e:
+        logger.exception("Whisper transcription failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not isinstance(result, dict):
+        return ORJSONResponse({"text": str(result)})
+
+    if regions:
+        restore_timestamps(result, regions)
+
+    if response_format in ("verbose_json", "json"):
+        return ORJSONResponse(result)
+
+    return {"text": result.get("text", "")}
+
+
 @app.post("/v1/audio/transcriptions")
 async def transcribe_audio(
     file: UploadFile = File(...),
@@ -197,48 +580,40 @@ async def transcribe_audio(
     if not MODEL_ID:
         raise HTTPException(status_code=503, detail="Whisper model not configured")
 
-    try:
-        import mlx_whisper
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"mlx-whisper is not available: {e}")
+    if mlx_whisper is None:
+        raise HTTPException(status_code=500, detail=f"mlx-whisper is not available: {MLX_WHISPER_IMPORT_ERROR}")
 
     if not file.filename:
         raise HTTPException(status_code=400, detail="Missing audio file")
 
     model_to_use = resolve_model_id(model or MODEL_ID)
-    model_path = prepare_whisper_model_path(model_to_use)
+    model_path = cached_model_path(model_to_use)
     language = language or DEFAULT_LANGUAGE
 
-    suffix = Path(file.filename).suffix or ".wav"
-    with tempfile.NamedTemporaryFile(delete=True, suffix=suffix) as tmp:
-        contents = await file.read()
-        if not contents:
+    upload = file.file
+    suffix = Path(file.filename).suffix.lower() or ".wav"
+    audio = None
+    if suffix not in SEEKABLE_ONLY_SUFFIXES:
+        audio = await asyncio.to_thread(decode_upload, upload)
+    if audio is not None:
+        if audio.size == 0:
             raise HTTPException(status_code=400, detail="Empty audio file")
-        tmp.write(contents)
-        tmp.flush()
-
-        kwargs = build_transcribe_kwargs(
-            path_or_hf_repo=model_path,
-            language=language,
-            task=task,
-            temperature=temperature,
-            initial_prompt=prompt,
-            word_timestamps=word_timestamps,
+        return await run_transcription(
+            audio, model_path, language, prompt, response_format, temperature, task, word_timestamps
         )
 
-        try:
-            result = mlx_whisper.transcribe(tmp.name, **kwargs)
-        except Exception as e:
-            logger.exception("Whisper transcription failed")
-            raise HTTPException(status_code=500, detail=str(e))
-
-    if not isinstance(result, dict):
-        return JSONResponse({"text": str(result)})
-
-    if response_format in ("verbose_json", "json"):
-        return JSONResponse(result)
+    # ffmpeg cannot read this container from a pipe; hand mlx_whisper a real file
+    upload.seek(0)
+    with upload_tempfile(suffix) as (tmp, tmp_path):
+        # Copy the spooled upload in 1 MB chunks rather than materializing it as one bytes object
+        shutil.copyfileobj(upload, tmp, 1 << 20)
+        if tmp.tell() == 0:
+            raise HTTPException(status_code=400, detail="Empty audio file")
+        tmp.flush()
 
-    return {"text": result.get("text", "")}
+        return await run_transcription(
+            tmp_path, model_path, language, prompt, response_format, temperature, task, word_timestamps
+        )
 
 
 @app.get("/health")
@@ -254,4 +629,5 @@ if __name__ == "__main__":
     if not MODEL_ID:
         logger.error("Whisper model not configured. Exiting.")
     else:
-        uvicorn.run(app, host=HOST, port=PORT, loop="asyncio")
+        # "auto" picks uvloop and httptools when installed and falls back to asyncio/h11
+        uvicorn.run(app, host=HOST, port=PORT, loop="auto", http="auto")
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import sys
+from collections import Counter
 from pathlib import Path
 import tomllib
 
@@ -29,7 +30,8 @@ def main() -> int:
 
     errors: list[str] = []
 
-    ports_seen: dict[int, str] = {}
+    # (owner, port) for every port setting, so collisions are found in one pass afterwards
+    port_rows: list[tuple[str, int]] = []
 
     for name in REQUIRED_SERVICES:
         svc = services.get(name)
@@ -43,13 +45,20 @@ def main() -> int:
 
         for key in ("port", "backend_port"):
             if key in svc:
-                port = int(svc[key])
+                try:
+                    port = int(svc[key])
+                except (TypeError, ValueError):
+                    errors.append(f"[services.{name}] {key} is not an integer: {svc[key]!r}")
+                    continue
                 if port < 1 or port > 65535:
                     errors.append(f"[services.{name}] {key} out of range: {port}")
-                if port in ports_seen:
-                    errors.append(f"Port collision: {port} used by {ports_seen[port]} and services.{name}.{key}")
-                else:
-                    ports_seen[port] = f"services.{name}.{key}"
+                port_rows.append((f"services.{name}.{key}", port))
+
+    counts = Counter(port for _, port in port_rows)
+    for port, count in counts.items():
+        if count > 1:
+            owners = " and ".join(owner for owner, p in port_rows if p == port)
+            errors.append(f"Port collision: {port} used by {owners}")
 
     if errors:
         print("❌ Config validation failed:")